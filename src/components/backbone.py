@@ -204,7 +204,9 @@ class Backbone:
             None
         """
         self.track_box = TrackBox(
-            default_config=config["default"], boxes=config["boxes"]
+            default_config=config["default"],
+            boxes=config["boxes"],
+            use_umat=config["use_umat"],
         )
         if hasattr(self, "save_path") and config["save"]:
             self.track_box.config_save(
@@ -292,6 +294,9 @@ class Backbone:
                     thickness=2,
                 )
 
+            # Center points for track box
+            centers = []
+
             # Loop through the boxes
             for detect_output in boxes:
                 # xyxy location
@@ -396,9 +401,12 @@ class Backbone:
                 if self.__process_is_activate("heatmap", background=True):
                     self.heatmap.check(area=(x1, y1, x2, y2))
 
-                # Check for track box
-                if self.__process_is_activate("track_box"):
-                    self.track_box.check(pos=center)
+                # Collect for track box
+                centers.append(center)
+
+            # Check for track box
+            if self.__process_is_activate("track_box"):
+                self.track_box.check_batch(positions=centers)
 
             # Apply heatmap
             if self.__process_is_activate("heatmap", background=True):
@@ -407,7 +415,7 @@ class Backbone:
             # Add track box to frame
             if hasattr(self, "track_box") and self.status["track_box"]:
                 self.track_box.update()
-                self.track_box.apply(mask)
+                mask = self.track_box.apply(mask)
 
         # Put result to a safe thread
         self.queue.put(mask)
@@ -460,5 +468,11 @@ class Backbone:
         Returns:
             None
         """
+        # Let the running process finish before closing its outputs
+        if hasattr(self, "current_process"):
+            self.current_process.join()
+
         if hasattr(self, "heatmap"):
             self.heatmap.release()
+        if hasattr(self, "track_box"):
+            self.track_box.close()
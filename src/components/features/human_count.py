@@ -68,16 +68,19 @@ class HumanCount:
             "camera": camera,
         }
 
+        # Number of processed frames between two saves
+        self._frames_per_interval = max(1, round(interval * fps / max(1, speed)))
+
     def save(self) -> None:
         """Save value"""
 
-        # Calculate current
-        current = int(self.count * self.save_conf["speed"]) / self.save_conf["fps"]
-
         # Not first, check interval
-        if not (self.count != 0 and ((current % self.save_conf["interval"]) == 0)):
+        if self.count == 0 or self.count % self._frames_per_interval:
             return
 
+        # Calculate current
+        current = self.count * self.save_conf["speed"] // self.save_conf["fps"]
+
         # Write result
         with open(self.save_conf["save_path"], "a") as f:
             time_format = (
@@ -1,14 +1,30 @@
 from typing import Dict, Tuple, Union, Iterable
-from collections import deque
 from datetime import datetime
 
 import numpy as np
 import cv2
 
+from src.modules._tracking_kernels import count_hits, count_hits_grid
 from src.modules.utils import tuple_handler
 
 
 class Box:
+    __slots__ = (
+        "name",
+        "xyxy",
+        "smoothness",
+        "pt1",
+        "pt2",
+        "color",
+        "box_thickness",
+        "org",
+        "font_scale",
+        "text_thickness",
+        "glyphs",
+        "_value",
+        "_text_cached",
+    )
+
     def __init__(
         self,
         name: str,
@@ -35,86 +51,153 @@ class Box:
             font_scale (int): Font scale for the displayed text.
             text_thickness (int): Thickness of the text.
         """
+        # Validate once here, positions are not validated per frame
+        top_left = tuple_handler(top_left, max_dim=2)
+        bottom_right = tuple_handler(bottom_right, max_dim=2)
+
         self.name = str(name)
         self.xyxy = (*top_left, *bottom_right)
-        self.history = deque([], maxlen=smoothness)
-        self.count = 0
-        self.box_config = {
-            "pt1": top_left,
-            "pt2": bottom_right,
-            "color": color,
-            "thickness": box_thickness,
-        }
-        self.text_config = {
-            "org": tuple(x + y for x, y in zip(top_left, text_pos_adjust)),
-            "fontScale": font_scale,
-            "color": color,
-            "thickness": text_thickness,
-        }
-
-    def check(self, pos: Tuple) -> None:
+        self.smoothness = max(1, int(smoothness))
+        self.pt1 = top_left
+        self.pt2 = bottom_right
+        self.color = tuple(color)
+        self.box_thickness = box_thickness
+        self.org = tuple(x + y for x, y in zip(top_left, text_pos_adjust))
+        self.font_scale = font_scale
+        self.text_thickness = text_thickness
+
+        # Displayed text, only formatted again when the value changes
+        self._value = None
+        self._text_cached = ""
+
+        # Pre-rendered digits, shared by the TrackBox
+        self.glyphs = {}
+
+    def apply(
+        self, image: Union[cv2.Mat, np.ndarray], value: int
+    ) -> Union[cv2.Mat, np.ndarray]:
         """
-        Check if a position is within the box.
+        Apply the count label to the given image, borders are drawn by the TrackBox
 
         Args:
-            pos (Tuple): Position coordinates (x, y).
-        """
-        x1, y1, x2, y2 = self.xyxy
-
-        X, Y = tuple_handler(pos, max_dim=2)
-
-        if (x1 <= X <= x2) and (y1 <= Y <= y2):
-            self.count += 1
-
-    def update(self) -> None:
-        self.history.append(self.count)
-        self.count = 0
-
-    def get_value(self) -> int:
-        """
-        Get the smoothed count value.
+            image (Union[cv2.Mat, np.ndarray]): Input image
+            value (int): Smoothed count value to display
 
         Returns:
-            int: Smoothed count value.
+            Union[cv2.Mat, np.ndarray]: Result image
         """
-        return int(np.mean(self.history))
+        if value != self._value:
+            self._value = value
+            self._text_cached = str(value)
+
+        # Fall back to vector text when the digits can not be blitted
+        if not self.blit_text(image):
+            image = cv2.putText(
+                image,
+                self._text_cached,
+                self.org,
+                cv2.FONT_HERSHEY_SIMPLEX,
+                self.font_scale,
+                self.color,
+                self.text_thickness,
+            )
+        return image
 
-    def apply(self, image: Union[cv2.Mat, np.ndarray]) -> Union[cv2.Mat, np.ndarray]:
+    def blit_text(self, image: Union[cv2.Mat, np.ndarray]) -> bool:
         """
-        Apply result to the given image
+        Copy the pre-rendered digits of the current text onto the image.
 
         Args:
             image (Union[cv2.Mat, np.ndarray]): Input image
 
         Returns:
-            Union[cv2.Mat, np.ndarray]: Result image
+            bool: False if the text has no glyph or does not fit in the image.
         """
-        image = cv2.rectangle(image, **self.box_config)
-        image = cv2.putText(
-            img=image,
-            text=str(self.get_value()),
-            fontFace=cv2.FONT_HERSHEY_SIMPLEX,
-            **self.text_config,
-        )
-        return image
+        if not isinstance(image, np.ndarray):
+            return False
+
+        x, y = self.org
+        height, width = image.shape[:2]
+
+        # Locate every glyph before drawing anything
+        regions = []
+        for char in self._text_cached:
+            if char not in self.glyphs:
+                return False
+            glyph, mask, top, advance, pad = self.glyphs[char]
+            y1, x1 = y - top, x - pad
+            y2, x2 = y1 + glyph.shape[0], x1 + glyph.shape[1]
+            if y1 < 0 or x1 < 0 or y2 > height or x2 > width:
+                return False
+            regions.append((glyph, mask, image[y1:y2, x1:x2]))
+            x += advance
+
+        for glyph, mask, region in regions:
+            cv2.copyTo(glyph, mask, region)
+        return True
 
 
 class TrackBox:
-    def __init__(self, default_config: Dict, boxes: Iterable[Dict]) -> None:
+    # Spatial grid used when tracking many boxes
+    GRID_CELL = 64
+    GRID_MIN_BOXES = 16
+
+    def __init__(
+        self, default_config: Dict, boxes: Iterable[Dict], use_umat: bool = False
+    ) -> None:
         """
         Initialize a TrackBox class with given default configuration
 
         Args:
-            smoothness (int): Number of frames for smoothing. Defaults to 1.
-            color (Tuple): RGB values representing the color of the box and text.
-            box_thickness (int): Thickness of the box border.
-            text_pos_adjust (Tuple): Adjustment to the top-left corner for text positioning.
-            font_scale (int): Font scale for the displayed text.
-            text_thickness (int): Thickness of the text.
+            default_config (Dict): Default text and box settings shared by all boxes.
+            boxes (Iterable[Dict]): Configuration of each tracked box.
+            use_umat (bool, optional): Draw through cv2.UMat so OpenCL can be used. Defaults to False.
         """
         self.default_config = default_config
+        self.use_umat = use_umat
         self.boxes = [self.new(box_config) for box_config in boxes]
 
+        # Share one digit atlas between boxes with the same text style
+        atlases = {}
+        for box in self.boxes:
+            style = (box.font_scale, box.text_thickness, box.color)
+            if style not in atlases:
+                atlases[style] = self.render_glyphs(*style)
+            box.glyphs = atlases[style]
+
+        # Structure-of-arrays layout of the boxes for vectorized checking
+        self._xyxy = np.array([box.xyxy for box in self.boxes], dtype=np.int32).reshape(
+            -1, 4
+        )
+        self._counts = np.zeros(len(self.boxes), dtype=np.int64)
+
+        # Ring buffer of the per-frame counts, one column per box
+        self._smoothness = np.array(
+            [box.smoothness for box in self.boxes], dtype=np.int64
+        )
+        self._history = np.zeros(
+            (self._smoothness.max(initial=1), len(self.boxes)), dtype=np.int64
+        )
+        self._cursor = 0
+        self._filled = 0
+
+        # Running sum and size of each box smoothness window
+        self._sums = np.zeros(len(self.boxes), dtype=np.int64)
+        self._windows = np.zeros(len(self.boxes), dtype=np.int64)
+
+        # Displayed values, only recomputed after an update
+        self._values = []
+        self._dirty = True
+
+        # Only test the boxes around each position when there are many of them
+        self._grid = (
+            self.build_grid() if len(self.boxes) >= self.GRID_MIN_BOXES else None
+        )
+
+        # Compile the kernel now so the first frame is not delayed
+        self.check_batch(np.zeros((1, 2), dtype=np.int32))
+        self._counts.fill(0)
+
     def new(self, config: Dict) -> None:
         """
         Create a new tracked box.
@@ -130,14 +213,109 @@ class TrackBox:
             box_thickness=self.default_config["box"]["thickness"],
         )
 
+    def render_glyphs(
+        self, font_scale: int, thickness: int, color: Tuple
+    ) -> Dict[str, Tuple]:
+        """
+        Render the digits once with the given text style.
+
+        Args:
+            font_scale (int): Font scale for the displayed text.
+            thickness (int): Thickness of the text.
+            color (Tuple): RGB values representing the color of the text.
+
+        Returns:
+            Dict[str, Tuple]: (image, mask, top, advance, pad) of each digit, \
+                empty if this OpenCV build anti-aliases the text.
+        """
+        glyphs = {}
+        for char in "0123456789":
+            (width, height), baseline = cv2.getTextSize(
+                char, cv2.FONT_HERSHEY_SIMPLEX, font_scale, thickness
+            )
+
+            # Render the coverage in white so it does not depend on the color,
+            # strokes spread by the thickness around the text origin
+            pad = int(thickness)
+            mask = np.zeros(
+                (height + baseline + 2 * pad, width + 2 * pad), dtype=np.uint8
+            )
+            cv2.putText(
+                img=mask,
+                text=char,
+                org=(pad, height + pad),
+                fontFace=cv2.FONT_HERSHEY_SIMPLEX,
+                fontScale=font_scale,
+                color=255,
+                thickness=thickness,
+            )
+
+            # Soft edges would need blending, which is slower than putText
+            if np.any((mask != 0) & (mask != 255)):
+                return {}
+
+            # Distance to the next character origin
+            advance = (
+                cv2.getTextSize(
+                    char * 2, cv2.FONT_HERSHEY_SIMPLEX, font_scale, thickness
+                )[0][0]
+                - width
+            )
+
+            glyph = np.empty((*mask.shape, 3), dtype=np.uint8)
+            glyph[:] = color
+
+            glyphs[char] = (glyph, mask // 255, height + pad, advance, pad)
+        return glyphs
+
+    def build_grid(self) -> Tuple:
+        """
+        Build a uniform grid mapping each cell to the boxes overlapping it.
+
+        Returns:
+            Tuple: (cell, columns, rows, starts, indices) for `count_hits_grid`.
+        """
+        cell = self.GRID_CELL
+        columns = int(self._xyxy[:, 2].max(initial=0)) // cell + 1
+        rows = int(self._xyxy[:, 3].max(initial=0)) // cell + 1
+
+        # Rasterize each box into the cells it overlaps
+        cells = [[] for _ in range(columns * rows)]
+        for k, (x1, y1, x2, y2) in enumerate(np.maximum(self._xyxy, 0).tolist()):
+            for cy in range(y1 // cell, y2 // cell + 1):
+                for cx in range(x1 // cell, x2 // cell + 1):
+                    cells[cy * columns + cx].append(k)
+
+        # Flatten into offsets and indices
+        starts = np.zeros(len(cells) + 1, dtype=np.int64)
+        starts[1:] = np.cumsum([len(boxes) for boxes in cells])
+        indices = np.array([k for boxes in cells for k in boxes], dtype=np.int64)
+
+        return cell, columns, rows, starts, indices
+
     def check(self, pos: Tuple) -> None:
         """
         Check if the provided position is within any of the tracked boxes.
 
         Args:
-            pos (Tuple): Position coordinates (x, y).
+            pos (Tuple): Position coordinates (x, y) as two integers, not validated.
+        """
+        self.check_batch([pos])
+
+    def check_batch(self, positions: Union[np.ndarray, Iterable[Tuple]]) -> None:
         """
-        [box.check(pos) for box in self.boxes]
+        Check many positions against all of the tracked boxes at once.
+
+        Args:
+            positions (Union[np.ndarray, Iterable[Tuple]]): Integer position coordinates with shape (N, 2), not validated.
+        """
+        # Hot path: no validation
+        positions = np.ascontiguousarray(positions, dtype=np.int32).reshape(-1, 2)
+
+        if self._grid is None:
+            count_hits(positions, self._xyxy, self._counts)
+        else:
+            count_hits_grid(positions, self._xyxy, self._counts, *self._grid)
 
     def update(self) -> None:
         """
@@ -146,7 +324,20 @@ class TrackBox:
         Returns:
             None
         """
-        [box.update() for box in self.boxes]
+        size = len(self._history)
+
+        # Drop the value leaving each full window before it is overwritten
+        leaving = self._history[
+            (self._cursor - self._smoothness) % size, np.arange(len(self.boxes))
+        ]
+        self._sums += self._counts - leaving * (self._filled >= self._smoothness)
+
+        self._history[self._cursor] = self._counts
+        self._counts.fill(0)
+        self._cursor = (self._cursor + 1) % size
+        self._filled = min(self._filled + 1, size)
+        self._windows = np.minimum(self._filled, self._smoothness)
+        self._dirty = True
 
         if hasattr(self, "save_conf"):
             # Save value
@@ -163,10 +354,55 @@ class TrackBox:
             image (Union[cv2.Mat, np.ndarray]): Input image
 
         Returns:
-            Union[cv2.Mat, np.ndarray]: Result image
+            Union[cv2.Mat, np.ndarray]: Result image, a new array if the input was not contiguous or UMat is used
         """
-        [box.apply(image) for box in self.boxes]
-        return image
+        # Drawing in place needs a contiguous buffer
+        if not image.flags["C_CONTIGUOUS"]:
+            image = np.ascontiguousarray(image)
+
+        if self._dirty:
+            self._values = self.get_values().tolist()
+            self._dirty = False
+
+        if not hasattr(self, "_shape") or self._shape != image.shape:
+            self.bind(image.shape)
+
+        canvas = cv2.UMat(image) if self.use_umat else image
+
+        # Box borders never move, composite them in one pass
+        cv2.copyTo(self._overlay, self._mask, canvas)
+
+        for box, value in zip(self.boxes, self._values):
+            box.apply(canvas, value)
+        return canvas.get() if self.use_umat else image
+
+    def bind(self, shape: Tuple) -> None:
+        """
+        Render the box borders once for images of the given shape.
+
+        Args:
+            shape (Tuple): Shape of the image (height, width, channels).
+        """
+        self._shape = shape
+        self._overlay = np.zeros(shape, dtype=np.uint8)
+        self._mask = np.zeros(shape[:2], dtype=np.uint8)
+
+        for box in self.boxes:
+            cv2.rectangle(self._overlay, box.pt1, box.pt2, box.color, box.box_thickness)
+            cv2.rectangle(self._mask, box.pt1, box.pt2, 255, box.box_thickness)
+
+        # Keep both on the device when drawing through UMat
+        if self.use_umat:
+            self._overlay, self._mask = cv2.UMat(self._overlay), cv2.UMat(self._mask)
+
+    def get_values(self) -> np.ndarray:
+        """
+        Get the smoothed count value of every box.
+
+        Returns:
+            np.ndarray: Smoothed count values, one per box.
+        """
+        return self._sums // np.maximum(1, self._windows)
 
     def config_save(
         self, save_path: str, interval: int, fps: int, speed: int, camera: bool
@@ -182,10 +418,12 @@ class TrackBox:
             camera (bool): If using camera
         """
 
-        with open(save_path, "w") as f:
-            f.write(
-                f"{'time' if camera else 'second'},{','.join(box.name for box in self.boxes)}\n"
-            )
+        # Keep the file open, rows are flushed every few writes
+        self._writer = open(save_path, "w", buffering=1 << 16)
+        self._writer.write(
+            f"{'time' if camera else 'second'},{','.join(box.name for box in self.boxes)}\n"
+        )
+        self._writes = 0
 
         self.time = 0
         self.save_conf = {
@@ -196,27 +434,43 @@ class TrackBox:
             "camera": camera,
         }
 
+        # Number of processed frames between two saves
+        self._frames_per_interval = max(1, round(interval * fps / max(1, speed)))
+
     def save(self) -> None:
         """Save value"""
 
-        # Calculate current
-        current = int(self.time * self.save_conf["speed"]) / self.save_conf["fps"]
-
         # Not first, check interval
-        if not (self.time != 0 and ((current % self.save_conf["interval"]) == 0)):
+        if self.time == 0 or self.time % self._frames_per_interval:
             return
 
+        # Already closed
+        if self._writer.closed:
+            return
+
+        # Calculate current
+        current = self.time * self.save_conf["speed"] // self.save_conf["fps"]
+
         # Write result
-        with open(self.save_conf["save_path"], "a") as f:
-            time_format = (
-                datetime.now().strftime("%H:%M:%S")
-                if self.save_conf["camera"]
-                else int(current)
-            )
-            f.write(
-                f"{time_format},{','.join(str(box.get_value()) for box in self.boxes)}\n"
-            )
+        time_format = (
+            datetime.now().strftime("%H:%M:%S")
+            if self.save_conf["camera"]
+            else int(current)
+        )
+        self._writer.write(
+            f"{time_format},{','.join(map(str, self.get_values().tolist()))}\n"
+        )
+
+        # Flush periodically
+        self._writes += 1
+        if self._writes % 10 == 0:
+            self._writer.flush()
 
         # Reset time on camera
         if self.save_conf["camera"]:
             self.time = 0
+
+    def close(self) -> None:
+        """Flush and close the save file"""
+        if hasattr(self, "_writer"):
+            self._writer.close()
@@ -5,13 +5,13 @@ import torch
 
 
 class ViT(nn.Module):
-    # Available versions of the ViT model with associated architectures and weights
+    # Available versions of the ViT model with associated architectures, weights and hidden dimensions
     versions = {
-        "B_16": ( vit_b_16, ViT_B_16_Weights.DEFAULT ),
-        "B_32": ( vit_b_32, ViT_B_32_Weights.DEFAULT ),
-        "L_16": ( vit_l_16, ViT_L_16_Weights.DEFAULT ),
-        "L_32": ( vit_l_32, ViT_L_32_Weights.DEFAULT ),
-        "H_14": ( vit_h_14, ViT_H_14_Weights.DEFAULT ),
+        "B_16": ( vit_b_16, ViT_B_16_Weights.DEFAULT, 768 ),
+        "B_32": ( vit_b_32, ViT_B_32_Weights.DEFAULT, 768 ),
+        "L_16": ( vit_l_16, ViT_L_16_Weights.DEFAULT, 1024 ),
+        "L_32": ( vit_l_32, ViT_L_32_Weights.DEFAULT, 1024 ),
+        "H_14": ( vit_h_14, ViT_H_14_Weights.DEFAULT, 1280 ),
     }
 
     def __init__(
@@ -21,7 +21,10 @@ class ViT(nn.Module):
             dropout: float = 0.0,
             attention_dropout: float = 0.0,
             pretrained: bool = False,
-            freeze: bool = False
+            freeze: bool = False,
+            optimize: bool = False,
+            bf16: bool = False,
+            inference_mode: bool = False
         ) -> None:
         """
         Initialize a Vision Transformer (ViT) model.
@@ -33,6 +36,9 @@ class ViT(nn.Module):
             attention_dropout (float, optional): Attention dropout rate. Default: 0.0
             pretrained (bool, optional): Whether to use pre-trained weights. Default: False
             freeze (bool, optional): Whether to freeze model parameters. Default: False
+            optimize (bool, optional): Use channels-last memory format and TorchDynamo compilation. Default: False
+            bf16 (bool, optional): Run the forward pass under bfloat16 autocast. Default: False
+            inference_mode (bool, optional): Run the forward pass without autograd tracking. Default: False
 
         Raises:
             ValueError: If an unsupported version is specified.
@@ -46,13 +52,16 @@ class ViT(nn.Module):
         self.attention_dropout = attention_dropout
         self.pretrained = pretrained
         self.freeze = freeze
+        self.optimize = optimize
+        self.bf16 = bf16
+        self.inference_mode = inference_mode
 
         # Check if version is available
         if version not in self.versions:
             raise ValueError(f"Versions available: {list(self.versions.keys())}")
 
         # Get the features layer
-        model, weight = self.versions.get(version)
+        model, weight, hidden_dim = self.versions.get(version)
         self.features: nn.Module = model(
             weights = weight if pretrained else None,
             dropout = dropout,
@@ -65,8 +74,74 @@ class ViT(nn.Module):
                 param.requires_grad = False
 
         # Replace the fully-connected layer
-        self.features.heads = nn.Linear(768, num_classes)
+        self.hidden_dim: int = getattr(self.features, "hidden_dim", hidden_dim)
+        self.features.heads = nn.Linear(self.hidden_dim, num_classes)
+
+        # Compile in place so the state dict keys stay unchanged
+        if optimize:
+            self.features = self.features.to(memory_format = torch.channels_last)
+            self.features.compile(mode = "reduce-overhead", fullgraph = False)
 
 
     def forward(self, x: torch.Tensor) -> torch.Tensor:
+        if self.inference_mode:
+            with torch.inference_mode():
+                return self._forward(x)
+        return self._forward(x)
+
+
+    def _forward(self, x: torch.Tensor) -> torch.Tensor:
+        if self.optimize:
+            x = x.contiguous(memory_format = torch.channels_last)
+
+        if self.bf16:
+            with torch.autocast(device_type = x.device.type, dtype = torch.bfloat16):
+                return self.features(x)
         return self.features(x)
+
+
+    def to_int8(self) -> "ViT":
+        """
+        Apply int8 dynamic quantization to the linear layers for CPU inference.
+
+        Raises:
+            ValueError: If the model is not frozen.
+
+        Returns:
+            ViT: The quantized model.
+        """
+        if not self.freeze:
+            raise ValueError("Quantization is only supported on a frozen model.")
+
+        self.features = torch.ao.quantization.quantize_dynamic(
+            self.features, { nn.Linear }, dtype = torch.qint8
+        )
+        return self
+
+
+    def export_onnx(self, path: str, image_size: int = 224) -> None:
+        """
+        Export the model to ONNX, e.g. to build a TensorRT engine with `trtexec --int8`.
+        Uses the dynamo exporter (torch>=2.5), which requires `onnx` and `onnxscript`.
+
+        Args:
+            path (str): Path to save the ONNX file.
+            image_size (int, optional): Input image size. Default: 224
+        """
+        device = next(self.features.parameters()).device
+        training = self.features.training
+
+        try:
+            torch.onnx.export(
+                self.features.eval(),
+                torch.randn(1, 3, image_size, image_size, device = device),
+                path,
+                input_names = [ "image" ],
+                output_names = [ "logits" ],
+                dynamic_axes = { "image": { 0: "batch" }, "logits": { 0: "batch" } },
+                opset_version = 17,
+                dynamo = True
+            )
+        finally:
+            # Restore the previous mode, e.g. to continue training
+            self.features.train(training)
@@ -0,0 +1,66 @@
+from numba import njit
+import numpy as np
+
+__all__ = ["count_hits", "count_hits_grid"]
+
+
+@njit(cache=True)
+def count_hits(points: np.ndarray, xyxy: np.ndarray, counts: np.ndarray) -> None:
+    """
+    Count how many points fall within each box.
+
+    Args:
+        points (np.ndarray): Position coordinates (x, y) with shape (N, 2).
+        xyxy (np.ndarray): Box coordinates (x1, y1, x2, y2) with shape (K, 4).
+        counts (np.ndarray): Per-box counters with shape (K,), updated in place.
+    """
+    for k in range(xyxy.shape[0]):
+        x1, y1, x2, y2 = xyxy[k, 0], xyxy[k, 1], xyxy[k, 2], xyxy[k, 3]
+        hits = 0
+        for i in range(points.shape[0]):
+            x, y = points[i, 0], points[i, 1]
+            # Plain compares beat a packed 16-bit lane (SWAR) test here
+            if x1 <= x <= x2 and y1 <= y <= y2:
+                hits += 1
+        counts[k] += hits
+
+
+@njit(cache=True)
+def count_hits_grid(
+    points: np.ndarray,
+    xyxy: np.ndarray,
+    counts: np.ndarray,
+    cell: int,
+    columns: int,
+    rows: int,
+    starts: np.ndarray,
+    indices: np.ndarray,
+) -> None:
+    """
+    Count how many points fall within each box, testing only the boxes of each point cell.
+
+    Args:
+        points (np.ndarray): Position coordinates (x, y) with shape (N, 2).
+        xyxy (np.ndarray): Box coordinates (x1, y1, x2, y2) with shape (K, 4).
+        counts (np.ndarray): Per-box counters with shape (K,), updated in place.
+        cell (int): Size of a grid cell in pixels.
+        columns (int): Number of grid columns.
+        rows (int): Number of grid rows.
+        starts (np.ndarray): Offset of each cell in `indices`, with shape (columns * rows + 1,).
+        indices (np.ndarray): Box indices overlapping each cell, concatenated.
+    """
+    for i in range(points.shape[0]):
+        x, y = points[i, 0], points[i, 1]
+
+        # Negative coordinates share cell 0 with the boxes clamped there
+        cx, cy = max(x, 0) // cell, max(y, 0) // cell
+
+        # No box beyond the grid
+        if cx >= columns or cy >= rows:
+            continue
+
+        c = cy * columns + cx
+        for j in range(starts[c], starts[c + 1]):
+            k = indices[j]
+            if xyxy[k, 0] <= x <= xyxy[k, 2] and xyxy[k, 1] <= y <= xyxy[k, 3]:
+                counts[k] += 1
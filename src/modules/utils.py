@@ -1,4 +1,5 @@
 from typing import Union, Tuple, List
+from functools import lru_cache
 import os
 
 from rich import print
@@ -8,6 +9,9 @@ import torch
 __all__ = ["device_handler", "workers_handler", "tuple_handler"]
 
 
+_MAX_WORKERS = os.cpu_count() or 1
+
+
 def device_handler(value: str = "auto") -> str:
     """
     Handles the specification of device choice.
@@ -24,32 +28,38 @@ def device_handler(value: str = "auto") -> str:
     """
 
     # Check type
-    if not isinstance(value, str):
+    try:
+        value = value.strip().lower()
+    except AttributeError:
         raise TypeError(
             f"The 'value' parameter must be a string. Got {type(value)} instead."
         )
 
-    # Prepare
-    value = value.strip().lower()
+    return _device_handler(value)
+
+
+@lru_cache(maxsize=8)
+def _device_handler(value: str) -> str:
+    """Cached implementation of `device_handler`."""
 
     # Check options
-    match value:
-        case "auto":
-            device = "cuda" if torch.cuda.is_available() else "cpu"
+    if value == "auto":
+        return "cuda" if torch.cuda.is_available() else "cpu"
 
-        case "gpu" | value.startswith("cuda"):
-            if not torch.cuda.is_available():
-                raise ValueError("CUDA device not found.")
-            device = value if ":" in value else "cuda"
+    if value == "gpu" or value.startswith("cuda"):
+        if not torch.cuda.is_available():
+            raise ValueError("CUDA device not found.")
+        return value if ":" in value else "cuda"
 
-        case _:
-            raise ValueError(
-                f'Device options: ["auto", "cpu", "cuda", "cuda:[device]"]. Got {value} instead.'
-            )
+    if value == "cpu":
+        return "cpu"
 
-    return device
+    raise ValueError(
+        f'Device options: ["auto", "cpu", "cuda", "cuda:[device]"]. Got {value} instead.'
+    )
 
 
+@lru_cache(maxsize=64, typed=True)
 def workers_handler(value: Union[int, float]) -> int:
     """
     Calculate the number of workers based on an input value.
@@ -63,7 +73,7 @@ def workers_handler(value: Union[int, float]) -> int:
     Returns:
         int: The computed number of workers for parallel processing.
     """
-    max_workers = os.cpu_count()
+    max_workers = _MAX_WORKERS
     match value:
         case int():
             workers = value
@@ -97,6 +107,18 @@ def tuple_handler(value: Union[int, List[int], Tuple[int]], max_dim: int) -> Tup
         ValueError: If the length of 'value' is not equal to 'max_dim'.
     """
 
+    # Only scalars are memoized, sequences rarely repeat (e.g. per-detection boxes)
+    # and tuples compare equal across element types, e.g. (10.0, 20.0) == (10, 20)
+    if isinstance(value, int) and isinstance(max_dim, int):
+        return _tuple_handler(value, max_dim)
+
+    return _tuple_handler.__wrapped__(value, max_dim)
+
+
+@lru_cache(maxsize=64, typed=True)
+def _tuple_handler(value: Union[int, List[int], Tuple[int]], max_dim: int) -> Tuple:
+    """Cached implementation of `tuple_handler`."""
+
     # Check max_dim
     if not isinstance(max_dim, int) and max_dim > 1:
         raise TypeError(